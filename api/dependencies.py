@@ -3,16 +3,19 @@ Shared dependencies for API routes
 """
 
 import os
-from test_ocr_kyc import KYCIdentityVerifier
 
 # Initialize shared instances
 kyc_verifier = None
 
 
-def get_kyc_verifier() -> KYCIdentityVerifier:
+def get_kyc_verifier():
     """Get or create KYC verifier instance"""
     global kyc_verifier
     if kyc_verifier is None:
+        # Imported lazily: pulling in test_ocr_kyc (and transitively the
+        # openai/httpx stack) at module load slows server cold start
+        from test_ocr_kyc import KYCIdentityVerifier
+
         api_key = os.environ.get("FIREWORKS_API_KEY")
         kyc_verifier = KYCIdentityVerifier(api_key=api_key)
     return kyc_verifier
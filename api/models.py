@@ -68,7 +68,7 @@ class DocumentResponse(BaseModel):
     created_at: datetime = Field(description="Document creation timestamp")
     processed_at: Optional[datetime] = Field(default=None, description="Processing completion timestamp")
     source_file: Optional[str] = Field(default=None, description="Original filename")
-    image_preview: Optional[str] = Field(default=None, description="Base64 data URL of the uploaded image")
+    image_preview: Optional[str] = Field(default=None, description="URL for fetching the uploaded image preview")
     model_used: Optional[str] = Field(default=None, description="Model used for this inference")
     inference_time_ms: Optional[int] = Field(default=None, description="Inference time in milliseconds")
 
@@ -82,4 +82,4 @@ class DocumentListResponse(BaseModel):
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str = Field(default="healthy", description="Service status")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Current timestamp")
+    timestamp: datetime = Field(description="Current timestamp")
@@ -0,0 +1,177 @@
+"""
+Document storage backends for the API server
+
+The default backend keeps documents in a bounded in-process TTL cache.
+Setting KYC_REDIS_URL switches to a Redis-backed store so documents are
+visible across uvicorn workers (--workers N) or multiple pods.
+"""
+
+import os
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from cachetools import TTLCache
+from sortedcontainers import SortedList
+
+from api.models import DocumentResponse
+
+
+def _remove_file_quietly(file_path: str):
+    """Delete a temp file, ignoring races with other cleanup paths"""
+    try:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    except OSError:
+        pass
+
+
+class InMemoryDocumentStore:
+    """Bounded TTL store for single-process deployments"""
+
+    def __init__(self, maxsize: int, ttl: int):
+        store = self
+
+        class _Cache(TTLCache):
+            """TTL cache that cleans up documents as they are evicted"""
+
+            def popitem(self):
+                document_id, document = super().popitem()
+                store._discard(document_id, document)
+                return document_id, document
+
+            def expire(self, time=None):
+                expired = super().expire(time)
+                for document_id, document in expired:
+                    store._discard(document_id, document)
+                return expired
+
+        self._documents: Dict[str, DocumentResponse] = _Cache(
+            maxsize=maxsize, ttl=ttl
+        )
+        # Sorted by created_at descending (newest first) for fast listing
+        self._by_time = SortedList(key=lambda d: -d.created_at.timestamp())
+        self._files: Dict[str, Tuple[str, str]] = {}
+
+    def _discard(self, document_id: str, document: DocumentResponse):
+        """Remove an evicted document from the time index and delete its file"""
+        try:
+            self._by_time.remove(document)
+        except ValueError:
+            pass
+        file_info = self._files.pop(document_id, None)
+        if file_info:
+            _remove_file_quietly(file_info[0])
+
+    async def put(self, document: DocumentResponse):
+        """Insert a new document"""
+        self._documents[document.id] = document
+        self._by_time.add(document)
+        # Safety net: if the record is dropped without going through
+        # eviction, the temp file is still removed on garbage collection
+        file_info = self._files.get(document.id)
+        if file_info:
+            weakref.finalize(document, _remove_file_quietly, file_info[0])
+
+    async def update(self, document: DocumentResponse):
+        """Persist changes to a stored document (in-place, no-op here)"""
+
+    async def get(self, document_id: str) -> Optional[DocumentResponse]:
+        """Fetch a document by ID, or None if absent/expired"""
+        return self._documents.get(document_id)
+
+    async def list(self, offset: int, limit: int) -> Tuple[List[DocumentResponse], int]:
+        """Return (documents newest-first, total count)"""
+        self._documents.expire()
+        return list(self._by_time[offset:offset + limit]), len(self._by_time)
+
+    async def set_file(self, document_id: str, file_path: str, mime_type: str):
+        """Record the uploaded file location for preview serving"""
+        self._files[document_id] = (file_path, mime_type)
+
+    async def get_file(self, document_id: str) -> Optional[Tuple[str, str]]:
+        """Fetch (file_path, mime_type) for a document, or None"""
+        return self._files.get(document_id)
+
+
+class RedisDocumentStore:
+    """Redis-backed store shared across workers; entries expire via key TTL"""
+
+    def __init__(self, url: str, ttl: int):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(url)
+        self._ttl = ttl
+
+    async def put(self, document: DocumentResponse):
+        """Insert a new document"""
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.set(
+                f"doc:{document.id}",
+                orjson.dumps(document.model_dump()),
+                ex=self._ttl
+            )
+            pipe.zadd(
+                "docs_by_time",
+                {document.id: document.created_at.timestamp()}
+            )
+            await pipe.execute()
+
+    async def update(self, document: DocumentResponse):
+        """Persist changes to a stored document"""
+        await self._redis.set(
+            f"doc:{document.id}",
+            orjson.dumps(document.model_dump()),
+            ex=self._ttl
+        )
+
+    async def get(self, document_id: str) -> Optional[DocumentResponse]:
+        """Fetch a document by ID, or None if absent/expired"""
+        data = await self._redis.get(f"doc:{document_id}")
+        if data is None:
+            return None
+        return DocumentResponse(**orjson.loads(data))
+
+    async def list(self, offset: int, limit: int) -> Tuple[List[DocumentResponse], int]:
+        """Return (documents newest-first, total count)"""
+        document_ids = await self._redis.zrevrange(
+            "docs_by_time", offset, offset + limit - 1
+        )
+        documents = []
+        for document_id in document_ids:
+            document = await self.get(document_id.decode())
+            if document is None:
+                # Key expired; drop it from the time index
+                await self._redis.zrem("docs_by_time", document_id)
+                continue
+            documents.append(document)
+        total = await self._redis.zcard("docs_by_time")
+        return documents, total
+
+    async def set_file(self, document_id: str, file_path: str, mime_type: str):
+        """Record the uploaded file location for preview serving"""
+        await self._redis.set(
+            f"docfile:{document_id}",
+            orjson.dumps([file_path, mime_type]),
+            ex=self._ttl
+        )
+
+    async def get_file(self, document_id: str) -> Optional[Tuple[str, str]]:
+        """Fetch (file_path, mime_type) for a document, or None"""
+        data = await self._redis.get(f"docfile:{document_id}")
+        if data is None:
+            return None
+        file_path, mime_type = orjson.loads(data)
+        return file_path, mime_type
+
+
+def create_document_store():
+    """Build the configured store backend (Redis if KYC_REDIS_URL is set)"""
+    ttl = int(os.environ.get("KYC_STORE_TTL_SECONDS", 3600))
+    redis_url = os.environ.get("KYC_REDIS_URL")
+    if redis_url:
+        return RedisDocumentStore(redis_url, ttl)
+    return InMemoryDocumentStore(
+        maxsize=int(os.environ.get("KYC_STORE_MAXSIZE", 10_000)),
+        ttl=ttl
+    )
@@ -2,18 +2,20 @@
 FastAPI backend server for KYC Identity Verification Dashboard
 """
 
+import asyncio
 import os
+import sys
 import uuid
-import base64
-import tempfile
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse
 import uvicorn
+import aiofiles
+import aiofiles.tempfile
 
 from api.models import (
     DocumentUploadRequest,
@@ -23,12 +25,14 @@ from api.models import (
     DocumentData
 )
 from api.dependencies import get_kyc_verifier
+from api.store import create_document_store
 
 # Initialize FastAPI app
 app = FastAPI(
     title="KYC Identity Verification API",
     description="API for processing identity documents with OCR",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -45,11 +49,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage (replace with database in production)
-documents_store: Dict[str, DocumentResponse] = {}
+# Document storage: in-process TTL cache by default, Redis when
+# KYC_REDIS_URL is set (required for uvicorn multi-worker deployments)
+store = create_document_store()
 
+# Maximum accepted upload size (10MB)
+MAX_FILE_SIZE = 10 * 1024 * 1024
 
-def process_document(
+# Cap concurrent OCR inferences so bursts of uploads queue instead of
+# thrashing the model / exhausting the Fireworks API quota
+max_concurrency = int(os.environ.get("KYC_MAX_CONCURRENCY", 4))
+processing_semaphore = asyncio.Semaphore(max_concurrency)
+processing_pool = ThreadPoolExecutor(max_workers=max_concurrency)
+
+# Keep references to in-flight processing tasks so they aren't GC'd
+processing_tasks: set = set()
+
+
+async def _mark_error(document_id: str, message: str):
+    """Record a processing failure with a single timestamp read"""
+    document = await store.get(document_id)
+    if document is not None:
+        document.status = "error"
+        document.error = message
+        document.processed_at = datetime.utcnow()
+        await store.update(document)
+
+
+async def process_document(
     document_id: str,
     file_path: str,
     document_type: str,
@@ -57,75 +84,76 @@ def process_document(
     deployment_type: str,
     custom_model_path: str = None
 ):
-    """Background task to process document"""
+    """Background task to process document, gated by the concurrency limit"""
     try:
-        # Update status to processing
-        if document_id in documents_store:
-            documents_store[document_id].status = "processing"
-
-        # Validate file exists
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Temporary file not found: {file_path}")
-
-        # Get verifier
-        verifier = get_kyc_verifier()
-
-        # Process document
-        start_time = time.perf_counter()
-        result = verifier.extract_identity_info(
-            image_source=file_path,
-            document_type=document_type
-        )
-        inference_time_ms = int((time.perf_counter() - start_time) * 1000)
-
-        # Validate result
-        if not result:
-            raise ValueError("No data extracted from document")
-
-        # Update document with results
-        if document_id in documents_store:
-            documents_store[document_id].status = "completed"
-            documents_store[document_id].data = DocumentData(**result)
-            documents_store[document_id].processed_at = datetime.utcnow()
-            documents_store[document_id].inference_time_ms = inference_time_ms
+        async with processing_semaphore:
+            # Update status to processing
+            document = await store.get(document_id)
+            if document is not None:
+                document.status = "processing"
+                await store.update(document)
+
+            # Validate file exists
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"Temporary file not found: {file_path}")
+
+            # Get verifier
+            verifier = get_kyc_verifier()
+
+            # Process document in the shared pool; the blocking OCR call
+            # must not run on the event loop
+            loop = asyncio.get_running_loop()
+            start_time = time.perf_counter()
+            result = await loop.run_in_executor(
+                processing_pool,
+                lambda: verifier.extract_identity_info(
+                    image_source=file_path,
+                    document_type=document_type
+                )
+            )
+            inference_time_ms = int((time.perf_counter() - start_time) * 1000)
+
+            # Validate result
+            if not result:
+                raise ValueError("No data extracted from document")
+
+        # Update document with results; the verifier's output is already
+        # shaped by the response schema, so skip field validation when its
+        # keys all map to known model fields
+        if result.keys() <= DocumentData.model_fields.keys():
+            data = DocumentData.model_construct(**result)
+        else:
+            data = DocumentData(**result)
+
+        # Take the completion timestamp once and reuse it
+        processed_at = datetime.utcnow()
+        document = await store.get(document_id)
+        if document is not None:
+            document.status = "completed"
+            document.data = data
+            document.processed_at = processed_at
+            document.inference_time_ms = inference_time_ms
+            await store.update(document)
 
     except FileNotFoundError as e:
-        # Update document with error
-        if document_id in documents_store:
-            documents_store[document_id].status = "error"
-            documents_store[document_id].error = f"File error: {str(e)}"
-            documents_store[document_id].processed_at = datetime.utcnow()
+        await _mark_error(document_id, f"File error: {str(e)}")
     except ValueError as e:
-        # Update document with error
-        if document_id in documents_store:
-            documents_store[document_id].status = "error"
-            documents_store[document_id].error = f"Processing error: {str(e)}"
-            documents_store[document_id].processed_at = datetime.utcnow()
+        await _mark_error(document_id, f"Processing error: {str(e)}")
     except Exception as e:
-        # Update document with error
-        if document_id in documents_store:
-            documents_store[document_id].status = "error"
-            documents_store[document_id].error = f"Unexpected error: {str(e)}"
-            documents_store[document_id].processed_at = datetime.utcnow()
-    finally:
-        # Clean up temp file
-        try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        except Exception as e:
-            # Log cleanup error but don't fail
-            print(f"Warning: Failed to clean up temp file {file_path}: {e}")
+        await _mark_error(document_id, f"Unexpected error: {str(e)}")
+    # Temp file is kept so the preview endpoint can serve it; it is
+    # cleaned up when the document is removed from the store
 
 
 @app.get("/api/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
-    return HealthResponse()
+    return HealthResponse(timestamp=datetime.utcnow())
 
 
 @app.post("/api/upload", response_model=DocumentResponse)
 async def upload_document(
-    background_tasks: BackgroundTasks,
+    request: Request,
     file: UploadFile = File(...),
     document_type: str = Form("auto"),
     model: str = Form("accounts/fireworks/models/qwen2p5-vl-32b-instruct"),
@@ -158,11 +186,11 @@ async def upload_document(
                 detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
             )
 
-        # Validate file size (10MB max)
-        file_content = await file.read()
-        if len(file_content) > 10 * 1024 * 1024:  # 10MB
+        # Reject oversized uploads up front, before reading any bytes;
+        # the chunked read below still enforces the cap if size is unknown
+        if file.size is not None and file.size > MAX_FILE_SIZE:
             raise HTTPException(
-                status_code=400,
+                status_code=413,
                 detail="File too large. Maximum size is 10MB"
             )
 
@@ -190,17 +218,32 @@ async def upload_document(
     # Create document ID
     document_id = str(uuid.uuid4())
 
-    # Create base64 preview for frontend display
-    mime_type = file.content_type or "image/jpeg"
-    base64_data = base64.b64encode(file_content).decode("utf-8")
-    image_preview = f"data:{mime_type};base64,{base64_data}"
+    # Stream the upload to a temp file chunk-by-chunk so the whole payload
+    # never sits in memory at once
+    chunk_size = 64 * 1024
+    file_size = 0
 
-    # Save file temporarily
-    temp_dir = tempfile.gettempdir()
-    temp_file_path = os.path.join(temp_dir, f"{document_id}{file_ext}")
+    try:
+        async with aiofiles.tempfile.NamedTemporaryFile(
+            delete=False, suffix=file_ext
+        ) as temp_file:
+            temp_file_path = temp_file.name
+            while chunk := await file.read(chunk_size):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail="File too large. Maximum size is 10MB"
+                    )
+                await temp_file.write(chunk)
+    except HTTPException:
+        os.remove(temp_file_path)
+        raise
 
-    with open(temp_file_path, "wb") as f:
-        f.write(file_content)
+    # Record the file location so the preview endpoint can serve the bytes
+    # directly, instead of base64-encoding them on every upload
+    mime_type = file.content_type or "image/jpeg"
+    await store.set_file(document_id, temp_file_path, mime_type)
 
     # Create document record
     document = DocumentResponse(
@@ -208,49 +251,82 @@ async def upload_document(
         status="pending",
         created_at=datetime.utcnow(),
         source_file=file.filename,
-        image_preview=image_preview,
+        image_preview=f"{str(request.base_url).rstrip('/')}/api/documents/{document_id}/preview",
         model_used=model
     )
-    documents_store[document_id] = document
+    await store.put(document)
 
     # Start background processing
-    background_tasks.add_task(
-        process_document,
-        document_id,
-        temp_file_path,
-        document_type,
-        model,
-        deployment_type,
-        custom_model_path
+    task = asyncio.create_task(
+        process_document(
+            document_id,
+            temp_file_path,
+            document_type,
+            model,
+            deployment_type,
+            custom_model_path
+        )
     )
+    processing_tasks.add(task)
+    task.add_done_callback(processing_tasks.discard)
 
     return document
 
 
 @app.get("/api/documents", response_model=DocumentListResponse)
-async def get_documents():
-    """Get list of all processed documents"""
-    documents = list(documents_store.values())
-    # Sort by created_at descending (newest first)
-    documents.sort(key=lambda x: x.created_at, reverse=True)
+async def get_documents(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000)
+):
+    """Get list of processed documents, newest first"""
+    documents, total = await store.list(offset, limit)
     return DocumentListResponse(
         documents=documents,
-        total=len(documents)
+        total=total
     )
 
 
 @app.get("/api/documents/{document_id}", response_model=DocumentResponse)
 async def get_document(document_id: str):
     """Get specific document by ID"""
-    if document_id not in documents_store:
+    document = await store.get(document_id)
+    if document is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Document not found"
+        )
+    return document
+
+
+@app.get("/api/documents/{document_id}/preview")
+async def get_document_preview(document_id: str):
+    """Serve the uploaded image for a document"""
+    file_info = await store.get_file(document_id)
+    if file_info is None:
         raise HTTPException(
             status_code=404,
             detail="Document not found"
         )
-    return documents_store[document_id]
+    file_path, mime_type = file_info
+    if not os.path.exists(file_path):
+        raise HTTPException(
+            status_code=404,
+            detail="Preview no longer available"
+        )
+    return FileResponse(file_path, media_type=mime_type)
 
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.environ.get("WORKERS", 1))
+    # uvloop/httptools aren't available on Windows; keep uvicorn defaults there
+    use_fast_loop = sys.platform != "win32"
+    uvicorn.run(
+        "api_server:app",
+        host="0.0.0.0",
+        port=port,
+        workers=workers,
+        loop="uvloop" if use_fast_loop else "auto",
+        http="httptools" if use_fast_loop else "auto"
+    )
 
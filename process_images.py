@@ -4,17 +4,45 @@ Process all identity documents from images/ directory for KYC verification
 
 import os
 import json
+import re
+import orjson
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from test_ocr_kyc import KYCIdentityVerifier
-
-# API key
-API_KEY = "fw_3ZRAE3N6e8Gx3PrvM8QnrGkA"
+from test_ocr_kyc import KYCIdentityVerifier, get_api_key
+
+# Number of concurrent extraction requests
+MAX_WORKERS = 8
+
+# Precompiled filename keywords for document-type dispatch
+DOC_TYPE_PATTERN = re.compile(r'(passport)|(license|licence|permit)', re.IGNORECASE)
+
+def doc_type_from_filename(filename: str) -> str:
+    """Infer document type from a filename keyword match"""
+    match = DOC_TYPE_PATTERN.search(filename)
+    if match is None:
+        return "auto"
+    return "passport" if match.group(1) else "driver_license"
+
+def extract_one(verifier, image_path, doc_type):
+    """Extract a single image, returning an error record on failure"""
+    try:
+        result = verifier.extract_identity_info(
+            image_source=str(image_path),
+            document_type=doc_type
+        )
+        result['source_file'] = image_path.name
+        return result
+    except Exception as e:
+        return {
+            'source_file': image_path.name,
+            'error': str(e)
+        }
 
 def process_all_images():
     """Process all images in the images/ directory"""
 
     # Initialize verifier
-    verifier = KYCIdentityVerifier(api_key=API_KEY)
+    verifier = KYCIdentityVerifier(api_key=get_api_key())
 
     # Get images directory
     images_dir = Path("images")
@@ -23,12 +51,13 @@ def process_all_images():
         print(f"✗ Error: {images_dir} directory not found")
         return
 
-    # Find all image files
-    image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp']
-    image_files = []
-    for ext in image_extensions:
-        image_files.extend(images_dir.glob(f"*{ext}"))
-        image_files.extend(images_dir.glob(f"*{ext.upper()}"))
+    # Find all image files in a single directory scan
+    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp'}
+    image_files = [
+        Path(entry.path)
+        for entry in os.scandir(images_dir)
+        if entry.is_file() and Path(entry.name).suffix.lower() in image_extensions
+    ]
 
     if not image_files:
         print(f"✗ No image files found in {images_dir}")
@@ -37,51 +66,51 @@ def process_all_images():
     print(f"Found {len(image_files)} image(s) to process\n")
     print("=" * 80)
 
-    results = []
-
-    for idx, image_path in enumerate(sorted(image_files), 1):
-        print(f"\n[{idx}/{len(image_files)}] Processing: {image_path.name}")
-        print("-" * 80)
-
-        # Determine document type from filename
-        filename_lower = image_path.name.lower()
-        if "passport" in filename_lower:
-            doc_type = "passport"
-        elif "license" in filename_lower:
-            doc_type = "driver_license"
-        else:
-            doc_type = "auto"
-
-        print(f"Document Type: {doc_type}")
-
-        try:
-            result = verifier.extract_identity_info(
-                image_source=str(image_path),
-                document_type=doc_type
-            )
-
-            result['source_file'] = image_path.name
-            results.append(result)
-
-            print("\n✓ Extraction Successful!")
-            print("\nExtracted Information:")
-            print(json.dumps(result, indent=2))
-
-        except Exception as e:
-            print(f"\n✗ Error processing {image_path.name}: {e}")
-            import traceback
-            traceback.print_exc()
-            results.append({
-                'source_file': image_path.name,
-                'error': str(e)
-            })
-
-        print("\n" + "=" * 80)
-
-    # Save results to JSON file
-    output_file = "kyc_extraction_results.json"
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=2)
+    image_files = sorted(image_files)
+
+    # Determine document type from filename
+    doc_types = [doc_type_from_filename(p.name) for p in image_files]
+
+    # Run extractions concurrently and stream each result to disk as it
+    # arrives, so memory stays flat no matter how many images are queued;
+    # executor.map preserves input order
+    output_file = "kyc_extraction_results.jsonl"
+    total = 0
+    successful = []  # (source_file, document_type, full_name)
+    failed = []  # (source_file, error)
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, \
+            open(output_file, 'wb') as f:
+        result_iter = executor.map(
+            extract_one,
+            [verifier] * len(image_files),
+            image_files,
+            doc_types
+        )
+        for idx, (image_path, doc_type, result) in enumerate(
+            zip(image_files, doc_types, result_iter), 1
+        ):
+            f.write(orjson.dumps(result) + b"\n")
+            total += 1
+
+            print(f"\n[{idx}/{len(image_files)}] Processed: {image_path.name}")
+            print("-" * 80)
+            print(f"Document Type: {doc_type}")
+
+            if 'error' in result:
+                failed.append((image_path.name, result['error']))
+                print(f"\n✗ Error processing {image_path.name}: {result['error']}")
+            else:
+                successful.append((
+                    image_path.name,
+                    result.get('document_type', 'unknown'),
+                    result.get('full_name', 'N/A')
+                ))
+                print("\n✓ Extraction Successful!")
+                print("\nExtracted Information:")
+                print(json.dumps(result, indent=2))
+
+            print("\n" + "=" * 80)
 
     print(f"\n\n✓ All images processed!")
     print(f"Results saved to: {output_file}")
@@ -90,22 +119,20 @@ def process_all_images():
     print("\n" + "=" * 80)
     print("SUMMARY")
     print("=" * 80)
-    successful = [r for r in results if 'error' not in r]
-    failed = [r for r in results if 'error' in r]
 
-    print(f"Total images: {len(results)}")
+    print(f"Total images: {total}")
     print(f"Successful: {len(successful)}")
     print(f"Failed: {len(failed)}")
 
     if successful:
         print("\nSuccessfully extracted documents:")
-        for r in successful:
-            print(f"  - {r['source_file']}: {r.get('document_type', 'unknown')} - {r.get('full_name', 'N/A')}")
+        for source_file, document_type, full_name in successful:
+            print(f"  - {source_file}: {document_type} - {full_name}")
 
     if failed:
         print("\nFailed documents:")
-        for r in failed:
-            print(f"  - {r['source_file']}: {r.get('error', 'Unknown error')}")
+        for source_file, error in failed:
+            print(f"  - {source_file}: {error}")
 
 if __name__ == "__main__":
     print("KYC Identity Verification - Batch Processing")
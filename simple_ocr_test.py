@@ -1,87 +1,108 @@
 """
 Simple example: Serverless API call to test OCR model for KYC
 
-This is a minimal example showing how to make a basic OCR API call
-for extracting text from identity documents.
+This is a minimal smoke test showing how to make OCR API calls for
+extracting text from identity documents. Calls for the whole
+(model, image) matrix run concurrently through one async client.
 """
 
+import argparse
+import asyncio
 import os
 import base64
-from openai import OpenAI
-
-
-def test_ocr_with_image_url():
-    """Test OCR with an image URL"""
-
-    # Initialize client
-    client = OpenAI(
-        api_key=os.environ.get("FIREWORKS_API_KEY"),
-        base_url="https://api.fireworks.ai/inference/v1"
-    )
-
-    # Make API call to extract text from image
-    response = client.chat.completions.create(
-        model="accounts/fireworks/models/qwen2p5-vl-32b-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Extract all text from this identity document. Include name, date of birth, document number, expiry date, and any other identifying information."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": "https://storage.googleapis.com/fireworks-public/image_assets/fireworks-ai-wordmark-color-dark.png"
+from typing import Optional
+from openai import AsyncOpenAI
+
+# Models and images covered by the smoke test; extend either list to
+# widen the matrix
+MODELS = [
+    "accounts/fireworks/models/qwen2p5-vl-32b-instruct",
+]
+
+IMAGE_URLS = [
+    "https://storage.googleapis.com/fireworks-public/image_assets/fireworks-ai-wordmark-color-dark.png",
+]
+
+PROMPT = (
+    "Extract all text from this identity document. Include name, date of "
+    "birth, document number, expiry date, and any other identifying "
+    "information."
+)
+
+# Shared client so all calls reuse the same connection pool
+# instead of paying a fresh TLS handshake each time
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_client() -> AsyncOpenAI:
+    """Get or create the shared async OpenAI client"""
+    global _client
+    if _client is None:
+        _client = AsyncOpenAI(
+            api_key=os.environ.get("FIREWORKS_API_KEY"),
+            base_url="https://api.fireworks.ai/inference/v1"
+        )
+    return _client
+
+
+def encode_image_data_url(image_path: str) -> str:
+    """Build a base64 data URL for a local image, encoding in chunks so
+    the whole file never sits in memory alongside its encoded copy.
+    Chunk size is a multiple of 3 so no padding is emitted mid-stream."""
+    data_url = bytearray(b"data:image/jpeg;base64,")
+    with open(image_path, "rb") as image_file:
+        while chunk := image_file.read(3 * 64 * 1024):
+            data_url.extend(base64.b64encode(chunk))
+    return data_url.decode('ascii')
+
+
+async def run_ocr(model: str, image_url: str, semaphore: asyncio.Semaphore):
+    """Run one OCR call, bounded by the shared concurrency cap"""
+    client = get_client()
+    async with semaphore:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": PROMPT},
+                        {
+                            "type": "image_url",
+                            "image_url": {"url": image_url}
                         }
-                    }
-                ]
-            }
-        ]
-    )
+                    ]
+                }
+            ]
+        )
+    return response.choices[0].message.content
 
-    print("Extracted Text:")
-    print(response.choices[0].message.content)
 
+async def run_smoke_tests(concurrency: int, local_images=()):
+    """Run the full (model, image) matrix concurrently"""
+    semaphore = asyncio.Semaphore(concurrency)
 
-def test_ocr_with_local_file(image_path: str):
-    """Test OCR with a local image file"""
+    image_urls = list(IMAGE_URLS)
+    image_urls.extend(encode_image_data_url(path) for path in local_images)
 
-    # Encode image to base64
-    with open(image_path, "rb") as image_file:
-        base64_image = base64.b64encode(image_file.read()).decode('utf-8')
-
-    # Initialize client
-    client = OpenAI(
-        api_key=os.environ.get("FIREWORKS_API_KEY"),
-        base_url="https://api.fireworks.ai/inference/v1"
+    pairs = [(model, url) for model in MODELS for url in image_urls]
+    results = await asyncio.gather(
+        *(run_ocr(model, url, semaphore) for model, url in pairs),
+        return_exceptions=True
     )
 
-    # Make API call
-    response = client.chat.completions.create(
-        model="accounts/fireworks/models/qwen2p5-vl-32b-instruct",
-        messages=[
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": "Extract all text from this passport/driver's license. Format the output as JSON with fields: full_name, date_of_birth, document_number, expiry_date, nationality."
-                    },
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    }
-                ]
-            }
-        ]
-    )
+    for (model, url), result in zip(pairs, results):
+        label = url if not url.startswith("data:") else "<local image>"
+        print("-" * 50)
+        print(f"Model: {model}")
+        print(f"Image: {label}")
+        if isinstance(result, Exception):
+            print(f"✗ Error: {result}")
+        else:
+            print("Extracted Text:")
+            print(result)
 
-    print("Extracted Information:")
-    print(response.choices[0].message.content)
+    return results
 
 
 if __name__ == "__main__":
@@ -91,12 +112,16 @@ if __name__ == "__main__":
         print("Please set it with: export FIREWORKS_API_KEY='your_api_key_here'")
         exit(1)
 
-    print("Testing OCR with image URL...")
-    print("-" * 50)
-    test_ocr_with_image_url()
-
-    # Uncomment to test with local file:
-    # print("\n" + "-" * 50)
-    # print("Testing OCR with local file...")
-    # test_ocr_with_local_file("path/to/your/document.jpg")
+    parser = argparse.ArgumentParser(description="OCR smoke tests")
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Maximum number of concurrent API calls"
+    )
+    parser.add_argument(
+        "images", nargs="*",
+        help="Optional local image files to include in the matrix"
+    )
+    args = parser.parse_args()
 
+    print("Running OCR smoke tests...")
+    asyncio.run(run_smoke_tests(args.concurrency, args.images))
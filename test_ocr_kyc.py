@@ -5,43 +5,436 @@ This script demonstrates how to use Fireworks AI vision models to extract
 information from identity documents (Passports, Driver's Licenses) for KYC processes.
 """
 
+import asyncio
 import os
 import base64
-import json
+import re
+import functools
+import hashlib
+import io
+import mimetypes
+import mmap
+import orjson
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from openai import OpenAI
-from typing import Optional, Dict, Any
+from cachetools import LRUCache
+from PIL import Image
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+    OpenAI,
+    RateLimitError
+)
+from typing import Optional, Dict, Any, AsyncIterator, Iterable, List, Union
+
+# Retry policy for transient API failures
+RETRY_MAX_ATTEMPTS = 3
+RETRY_MIN_WAIT = 1.0
+RETRY_MAX_WAIT = 30.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Vision models downsample internally, so pixels beyond this edge length
+# are discarded server-side; resize client-side instead of shipping them
+MAX_IMAGE_DIMENSION = 1568
+JPEG_QUALITY = 88
+
+# Output budget for a single structured extraction (~1-2KB of JSON).
+# A tight cap frees the server's batching slot as soon as the document
+# is emitted instead of reserving context-limit headroom
+MAX_OUTPUT_TOKENS = 1024
+
+# Extraction prompts, built once at import time
+_PASSPORT_PROMPT = """Extract all relevant information from this passport document for KYC identity verification.
+
+IMPORTANT: Extract the COMPLETE, UNMASKED values exactly as they appear on the document. Do NOT mask, redact, or replace any characters with asterisks or stars.
+
+For each extracted field, also provide:
+- Bounding box coordinates [x1, y1, x2, y2] in pixels relative to the image size
+- A confidence score between 0 and 1 (1 = highest confidence)
+
+For each extracted field, also provide the bounding box coordinates [x1, y1, x2, y2] where:
+- (x1, y1) is the top-left corner
+- (x2, y2) is the bottom-right corner
+- Coordinates are in pixels relative to the image dimensions
+
+Focus on extracting:
+- Full name (as it appears on the passport) - extract the complete name without masking
+- Date of birth - extract the complete date without masking
+- Passport number - extract the complete number without masking
+- Expiry date
+- Issue date
+- Nationality - extract the complete nationality without masking
+- Any other identifying information
+
+Be precise and extract dates in YYYY-MM-DD format. Include all visible text from the document. Return the actual values as they appear, not masked versions."""
+
+_DRIVER_LICENSE_PROMPT = """Extract all relevant information from this driver's license document for KYC identity verification.
+
+IMPORTANT: Extract the COMPLETE, UNMASKED values exactly as they appear on the document. Do NOT mask, redact, or replace any characters with asterisks or stars.
+
+For each extracted field, also provide:
+- Bounding box coordinates [x1, y1, x2, y2] in pixels relative to the image size
+- A confidence score between 0 and 1 (1 = highest confidence)
+
+For each extracted field, also provide the bounding box coordinates [x1, y1, x2, y2] where:
+- (x1, y1) is the top-left corner
+- (x2, y2) is the bottom-right corner
+- Coordinates are in pixels relative to the image dimensions
+
+Focus on extracting:
+- Full name (as it appears on the license) - extract the complete name without masking
+- Date of birth - extract the complete date without masking
+- License number - extract the complete number without masking
+- Expiry date
+- Issue date
+- Address - extract the complete address without masking
+- Any other identifying information
+
+Be precise and extract dates in YYYY-MM-DD format. Include all visible text from the document. Return the actual values as they appear, not masked versions."""
+
+_AUTO_DETECT_PROMPT = """Analyze this identity document and extract all relevant information for KYC identity verification.
+
+IMPORTANT: Extract the COMPLETE, UNMASKED values exactly as they appear on the document. Do NOT mask, redact, or replace any characters with asterisks or stars.
+
+For each extracted field, also provide:
+- Bounding box coordinates [x1, y1, x2, y2] in pixels relative to the image size
+- A confidence score between 0 and 1 (1 = highest confidence)
+
+For each extracted field, also provide the bounding box coordinates [x1, y1, x2, y2] where:
+- (x1, y1) is the top-left corner
+- (x2, y2) is the bottom-right corner
+- Coordinates are in pixels relative to the image dimensions
+
+First, identify the document type (passport, driver's license, national ID, etc.), then extract:
+- Full name - extract the complete name without masking
+- Date of birth - extract the complete date without masking
+- Document number - extract the complete number without masking
+- Expiry date
+- Issue date
+- Nationality (if applicable) - extract the complete nationality without masking
+- Address (if applicable) - extract the complete address without masking
+- Any other identifying information
+
+Be precise and extract dates in YYYY-MM-DD format. Include all visible text from the document. Return the actual values as they appear, not masked versions."""
+
+# Matches sources the API consumes by reference: http(s) and cloud-bucket
+# URLs, plus data: URIs that are already encoded. Bound method is hoisted
+# so tight batch loops skip the attribute lookups
+_URL_MATCH = re.compile(r'^(?:(?:https?|s3|gs)://|data:)').match
+
+_PROMPTS = {
+    "passport": _PASSPORT_PROMPT,
+    "driver_license": _DRIVER_LICENSE_PROMPT,
+    "auto": _AUTO_DETECT_PROMPT
+}
+
+# Structured-output schema for a single extracted document, built once at
+# import time; treat as read-only
+_IDENTITY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "document_type": {
+            "type": "string",
+            "description": "Type of document identified (passport, driver_license, etc.)"
+        },
+        "full_name": {
+            "type": "string",
+            "description": "Full name as it appears on the document - extract complete unmasked value, do not use asterisks or stars"
+        },
+        "full_name_bbox": {
+            "type": "array",
+            "items": {"type": "number"},
+            "description": "Bounding box coordinates [x1, y1, x2, y2] for full_name field"
+        },
+        "full_name_confidence": {
+            "type": "number",
+            "description": "Confidence (0-1) for full_name extraction"
+        },
+        "date_of_birth": {
+            "type": "string",
+            "description": "Date of birth in YYYY-MM-DD format - extract complete unmasked value, do not use asterisks or stars"
+        },
+        "date_of_birth_bbox": {
+            "type": "array",
+            "items": {"type": "number"},
+            "description": "Bounding box coordinates [x1, y1, x2, y2] for date_of_birth field"
+        },
+        "date_of_birth_confidence": {
+            "type": "number",
+            "description": "Confidence (0-1) for date_of_birth extraction"
+        },
+        "document_number": {
+            "type": "string",
+            "description": "Document number (passport number, license number, etc.) - extract complete unmasked value, do not use asterisks or stars"
+        },
+        "document_number_bbox": {
+            "type": "array",
+            "items": {"type": "number"},
+            "description": "Bounding box coordinates [x1, y1, x2, y2] for document_number field"
+        },
+        "document_number_confidence": {
+            "type": "number",
+            "description": "Confidence (0-1) for document_number extraction"
+        },
+        "expiry_date": {
+            "type": "string",
+            "description": "Document expiry date in YYYY-MM-DD format"
+        },
+        "expiry_date_bbox": {
+            "type": "array",
+            "items": {"type": "number"},
+            "description": "Bounding box coordinates [x1, y1, x2, y2] for expiry_date field"
+        },
+        "expiry_date_confidence": {
+            "type": "number",
+            "description": "Confidence (0-1) for expiry_date extraction"
+        },
+        "issue_date": {
+            "type": "string",
+            "description": "Document issue date in YYYY-MM-DD format"
+        },
+        "issue_date_bbox": {
+            "type": "array",
+            "items": {"type": "number"},
+            "description": "Bounding box coordinates [x1, y1, x2, y2] for issue_date field"
+        },
+        "issue_date_confidence": {
+            "type": "number",
+            "description": "Confidence (0-1) for issue_date extraction"
+        },
+        "nationality": {
+            "type": "string",
+            "description": "Nationality as shown on document - extract complete unmasked value, do not use asterisks or stars"
+        },
+        "nationality_bbox": {
+            "type": "array",
+            "items": {"type": "number"},
+            "description": "Bounding box coordinates [x1, y1, x2, y2] for nationality field"
+        },
+        "nationality_confidence": {
+            "type": "number",
+            "description": "Confidence (0-1) for nationality extraction"
+        },
+        "address": {
+            "type": "string",
+            "description": "Address if available on document - extract complete unmasked value, do not use asterisks or stars"
+        },
+        "address_bbox": {
+            "type": "array",
+            "items": {"type": "number"},
+            "description": "Bounding box coordinates [x1, y1, x2, y2] for address field"
+        },
+        "address_confidence": {
+            "type": "number",
+            "description": "Confidence (0-1) for address extraction"
+        },
+        "extracted_text": {
+            "type": "string",
+            "description": "All text extracted from the document - extract complete unmasked text, do not use asterisks or stars"
+        }
+    },
+    "required": [
+        "document_type",
+        "full_name",
+        "document_number",
+        "extracted_text"
+    ]
+}
+
+
+def _without_fields(schema, prefixes):
+    """Copy a schema, dropping properties whose names start with prefixes"""
+    return {
+        **schema,
+        "properties": {
+            name: spec for name, spec in schema["properties"].items()
+            if not name.startswith(prefixes)
+        }
+    }
+
+
+# Per-type schema variants: passports carry no address, licenses no
+# nationality. Dropping unused properties shrinks the constrained-decoding
+# grammar and the tokens generated per request; the full schema is kept
+# only for auto-detection
+_SCHEMAS = {
+    "passport": _without_fields(_IDENTITY_SCHEMA, ("address",)),
+    "driver_license": _without_fields(_IDENTITY_SCHEMA, ("nationality",)),
+    "auto": _IDENTITY_SCHEMA
+}
+
+_RESPONSE_FORMATS = {
+    document_type: {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "identity_verification",
+            "schema": schema
+        }
+    }
+    for document_type, schema in _SCHEMAS.items()
+}
+
+
+@functools.lru_cache(maxsize=1)
+def get_api_key() -> Optional[str]:
+    """Read the Fireworks API key from the environment, once per process"""
+    return os.environ.get("FIREWORKS_API_KEY")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_http_client() -> httpx.Client:
+    """Shared HTTP/2 keep-alive transport reused across verifier instances,
+    so repeated construction doesn't pay fresh TCP+TLS handshakes"""
+    return httpx.Client(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=60
+        )
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _get_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of the shared HTTP/2 keep-alive transport"""
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=100,
+            max_keepalive_connections=20,
+            keepalive_expiry=60
+        )
+    )
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Check whether an API error is transient (throttling or 5xx)"""
+    if isinstance(error, (RateLimitError, APITimeoutError, APIConnectionError)):
+        return True
+    return (
+        isinstance(error, APIStatusError)
+        and error.status_code in RETRYABLE_STATUS_CODES
+    )
+
+
+def _retry_wait(error: Exception, attempt: int) -> float:
+    """Exponential backoff, honoring a server-provided Retry-After header"""
+    wait = RETRY_MIN_WAIT * (2 ** attempt)
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            wait = max(wait, float(response.headers.get("retry-after")))
+        except (TypeError, ValueError):
+            pass
+    return min(wait, RETRY_MAX_WAIT)
 
 
 class KYCIdentityVerifier:
     """OCR-based identity verification using Fireworks AI vision models"""
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        upload_base_url: Optional[str] = None,
+        cache_enabled: bool = False,
+        warm_connection: bool = True
+    ):
         """
         Initialize the KYC Identity Verifier
 
         Args:
             api_key: Fireworks API key. If not provided, reads from FIREWORKS_API_KEY env var
+            upload_base_url: Optional HTTP(S) base URL of a blob store. When
+                set (or via KYC_IMAGE_UPLOAD_URL), local images are uploaded
+                once with PUT and referenced by URL, instead of being inlined
+                as base64 data URIs that inflate every request body by ~33%
+            cache_enabled: Cache extraction results keyed by image content,
+                so re-running the same document returns instantly instead of
+                repeating the API call
+            warm_connection: Prime the keep-alive pool with a pre-flight
+                ping at init, so the first extraction skips the TCP+TLS
+                handshake (~150-250ms to the API)
         """
-        self.api_key = api_key or os.environ.get("FIREWORKS_API_KEY")
+        self.api_key = api_key or get_api_key()
         if not self.api_key:
             raise ValueError(
                 "API key not provided. Set FIREWORKS_API_KEY environment variable "
                 "or pass api_key parameter"
             )
 
+        self.upload_base_url = upload_base_url or os.environ.get("KYC_IMAGE_UPLOAD_URL")
+
         self.client = OpenAI(
             api_key=self.api_key,
-            base_url="https://api.fireworks.ai/inference/v1"
+            base_url="https://api.fireworks.ai/inference/v1",
+            http_client=_get_http_client()
         )
 
         # Using a vision model capable of OCR
         self.model = "accounts/fireworks/models/qwen2p5-vl-32b-instruct"
 
+        self.cache_enabled = cache_enabled
+        self._result_cache = LRUCache(maxsize=256) if cache_enabled else None
+
+        if warm_connection:
+            self._warm_connection()
+
+    def _warm_connection(self):
+        """Prime the connection pool with a cheap pre-flight request
+
+        Failures are ignored: this is purely an optimization and the real
+        call path has its own retry handling.
+        """
+        try:
+            self.client.models.list(timeout=2.0)
+        except Exception:
+            pass
+
     def _encode_image(self, image_path: str) -> str:
-        """Encode local image file to base64"""
+        """Encode local image file to base64 via a memory map
+
+        Mapping the file lets b64encode read straight from the page cache
+        instead of first copying the whole file into a bytes object, so
+        only the encoded output is allocated. The final decode is ASCII
+        since base64 output needs no utf-8 scan.
+        """
         with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+            with mmap.mmap(
+                image_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as mapped:
+                return base64.b64encode(mapped).decode('ascii')
+
+    def _preprocess_image(self, image_path: str) -> Optional[bytes]:
+        """Downscale an oversized image to the model's input resolution
+
+        A 12MP passport photo is mostly discarded server-side after the
+        model downsamples it, so resizing here cuts encode CPU and upload
+        bandwidth by the same factor. Returns re-encoded JPEG bytes, or
+        None when the image is already within bounds (or unreadable) and
+        the original file should be sent as-is.
+        """
+        try:
+            with Image.open(image_path) as image:
+                if max(image.size) <= MAX_IMAGE_DIMENSION:
+                    return None
+                image.thumbnail(
+                    (MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION),
+                    Image.LANCZOS
+                )
+                if image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                buffer = io.BytesIO()
+                image.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+                return buffer.getvalue()
+        except OSError:
+            # Not an image Pillow can read; let the API reject it instead
+            return None
 
     def _prepare_image_content(self, image_source: str) -> Dict[str, Any]:
         """
@@ -53,21 +446,78 @@ class KYCIdentityVerifier:
         Returns:
             Dictionary with image content formatted for API
         """
-        if image_source.startswith(('http://', 'https://')):
-            # Image URL
+        if _URL_MATCH(image_source):
+            # URL or data: URI - passed through untouched. This is strictly
+            # the cheapest path: no download, no base64 pass, and for URLs
+            # the request body stays a few hundred bytes
             return {
                 "type": "image_url",
                 "image_url": {"url": image_source}
             }
-        else:
-            # Local file - encode to base64
-            base64_image = self._encode_image(image_source)
+
+        if image_source.startswith('file://'):
+            # file:// URLs are local paths in disguise; unwrap rather than
+            # sending a scheme the API can't fetch
+            image_source = image_source[len('file://'):]
+
+        if self.upload_base_url:
+            # Upload once and pass by reference, keeping the request body small
             return {
                 "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
-                }
+                "image_url": {"url": self._upload_image(image_source)}
+            }
+
+        # Local file - downscale if oversized, then encode to base64 with
+        # the real MIME type so the server doesn't have to re-sniff (or
+        # reject) a mislabelled image
+        processed = self._preprocess_image(image_source)
+        if processed is not None:
+            mime_type = "image/jpeg"
+            base64_image = base64.b64encode(processed).decode('ascii')
+        else:
+            mime_type = mimetypes.guess_type(image_source)[0] or "image/jpeg"
+            base64_image = self._encode_image(image_source)
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{mime_type};base64,{base64_image}"
             }
+        }
+
+    def _cache_key(self, image_source: str, document_type: str) -> str:
+        """Build a cache key from image content, document type and model
+
+        URLs are hashed by their string; downloading the bytes just to
+        key the cache would cost more than the call it saves.
+        """
+        digest = hashlib.sha256()
+        if _URL_MATCH(image_source):
+            digest.update(image_source.encode())
+        else:
+            with open(image_source, "rb") as image_file:
+                with mmap.mmap(
+                    image_file.fileno(), 0, access=mmap.ACCESS_READ
+                ) as mapped:
+                    digest.update(mapped)
+        digest.update(document_type.encode())
+        digest.update(self.model.encode())
+        return digest.hexdigest()
+
+    def _upload_image(self, image_path: str) -> str:
+        """Upload a local image to the configured blob store, returning its URL"""
+        path = Path(image_path)
+        processed = self._preprocess_image(image_path)
+        suffix = ".jpg" if processed is not None else path.suffix.lower()
+        target_url = (
+            f"{self.upload_base_url.rstrip('/')}/{uuid.uuid4().hex}{suffix}"
+        )
+        if processed is not None:
+            response = _get_http_client().put(target_url, content=processed)
+        else:
+            with open(path, "rb") as image_file:
+                response = _get_http_client().put(target_url, content=image_file)
+        response.raise_for_status()
+        return target_url
 
     def extract_identity_info(
         self,
@@ -84,244 +534,418 @@ class KYCIdentityVerifier:
         Returns:
             Dictionary containing extracted identity information
         """
+        if self.cache_enabled:
+            cache_key = self._cache_key(image_source, document_type)
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
+
         # Prepare the prompt based on document type
-        if document_type == "passport":
-            prompt = self._get_passport_prompt()
-        elif document_type == "driver_license":
-            prompt = self._get_driver_license_prompt()
-        else:
-            prompt = self._get_auto_detect_prompt()
+        prompt = self._get_prompt(document_type)
 
         # Prepare image content
         image_content = self._prepare_image_content(image_source)
 
         # Make API call with structured output
-        response = self.client.chat.completions.create(
+        response = self._call_with_retry(
+            **self._completion_request(prompt, image_content, document_type)
+        )
+
+        # Parse and return the response
+        result = orjson.loads(response.choices[0].message.content)
+        if self.cache_enabled:
+            # Store a copy so callers mutating the result can't poison it
+            self._result_cache[cache_key] = dict(result)
+        return result
+
+    def extract_identity_info_from_url(
+        self,
+        image_url: str,
+        document_type: str = "auto"
+    ) -> Dict[str, Any]:
+        """Extract from an image the API fetches by URL
+
+        No download or base64 pass happens client-side, so prefer this
+        over downloading a remote image just to re-encode it.
+        """
+        return self.extract_identity_info(image_url, document_type)
+
+    def extract_identity_info_from_file(
+        self,
+        image_path: str,
+        document_type: str = "auto"
+    ) -> Dict[str, Any]:
+        """Extract from a local file, paying the base64 encode (~33% body
+        inflation) unless an upload base URL is configured"""
+        return self.extract_identity_info(image_path, document_type)
+
+    def extract_identity_info_batch(
+        self,
+        image_sources: List[str],
+        document_type: str = "auto",
+        batch_size: int = 8
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract identity information from many documents, batching several
+        images into each chat request
+
+        Sending one request with N images amortizes prompt, TLS and
+        queueing overhead across the batch. If a batched response cannot
+        be parsed, the batch falls back to per-image calls.
+
+        Args:
+            image_sources: Paths or URLs of document images
+            document_type: Type applied to every document
+            batch_size: Images per request; keep modest (4-16) so the
+                batch fits the model's context window
+
+        Returns:
+            List of result dictionaries, in input order
+        """
+        results = []
+        for start in range(0, len(image_sources), batch_size):
+            batch = image_sources[start:start + batch_size]
+            try:
+                results.extend(self._extract_batch(batch, document_type))
+            except (orjson.JSONDecodeError, KeyError, ValueError):
+                # Fall back to per-image calls for this batch
+                results.extend(
+                    self.extract_identity_info(source, document_type)
+                    for source in batch
+                )
+        return results
+
+    def _extract_batch(
+        self,
+        batch: List[str],
+        document_type: str
+    ) -> List[Dict[str, Any]]:
+        """Run one multi-image extraction request"""
+        prompt = (
+            f"{self._get_prompt(document_type)}\n\n"
+            f"You are given {len(batch)} document images. Return a JSON "
+            f"object with a \"documents\" array containing one result per "
+            f"image, in the same order as the images."
+        )
+        content = [{"type": "text", "text": prompt}]
+        content.extend(self._prepare_image_content(source) for source in batch)
+
+        # Wrap the single-document schema in a documents array
+        response = self._call_with_retry(
             model=self.model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        image_content
-                    ]
-                }
-            ],
+            messages=[{"role": "user", "content": content}],
             response_format={
                 "type": "json_schema",
                 "json_schema": {
-                    "name": "identity_verification",
+                    "name": "identity_verification_batch",
                     "schema": {
                         "type": "object",
                         "properties": {
-                            "document_type": {
-                                "type": "string",
-                                "description": "Type of document identified (passport, driver_license, etc.)"
-                            },
-                            "full_name": {
-                                "type": "string",
-                                "description": "Full name as it appears on the document - extract complete unmasked value, do not use asterisks or stars"
-                            },
-                            "full_name_bbox": {
-                                "type": "array",
-                                "items": {"type": "number"},
-                                "description": "Bounding box coordinates [x1, y1, x2, y2] for full_name field"
-                            },
-                            "full_name_confidence": {
-                                "type": "number",
-                                "description": "Confidence (0-1) for full_name extraction"
-                            },
-                            "date_of_birth": {
-                                "type": "string",
-                                "description": "Date of birth in YYYY-MM-DD format - extract complete unmasked value, do not use asterisks or stars"
-                            },
-                            "date_of_birth_bbox": {
-                                "type": "array",
-                                "items": {"type": "number"},
-                                "description": "Bounding box coordinates [x1, y1, x2, y2] for date_of_birth field"
-                            },
-                            "date_of_birth_confidence": {
-                                "type": "number",
-                                "description": "Confidence (0-1) for date_of_birth extraction"
-                            },
-                            "document_number": {
-                                "type": "string",
-                                "description": "Document number (passport number, license number, etc.) - extract complete unmasked value, do not use asterisks or stars"
-                            },
-                            "document_number_bbox": {
-                                "type": "array",
-                                "items": {"type": "number"},
-                                "description": "Bounding box coordinates [x1, y1, x2, y2] for document_number field"
-                            },
-                            "document_number_confidence": {
-                                "type": "number",
-                                "description": "Confidence (0-1) for document_number extraction"
-                            },
-                            "expiry_date": {
-                                "type": "string",
-                                "description": "Document expiry date in YYYY-MM-DD format"
-                            },
-                            "expiry_date_bbox": {
-                                "type": "array",
-                                "items": {"type": "number"},
-                                "description": "Bounding box coordinates [x1, y1, x2, y2] for expiry_date field"
-                            },
-                            "expiry_date_confidence": {
-                                "type": "number",
-                                "description": "Confidence (0-1) for expiry_date extraction"
-                            },
-                            "issue_date": {
-                                "type": "string",
-                                "description": "Document issue date in YYYY-MM-DD format"
-                            },
-                            "issue_date_bbox": {
+                            "documents": {
                                 "type": "array",
-                                "items": {"type": "number"},
-                                "description": "Bounding box coordinates [x1, y1, x2, y2] for issue_date field"
-                            },
-                            "issue_date_confidence": {
-                                "type": "number",
-                                "description": "Confidence (0-1) for issue_date extraction"
-                            },
-                            "nationality": {
-                                "type": "string",
-                                "description": "Nationality as shown on document - extract complete unmasked value, do not use asterisks or stars"
-                            },
-                            "nationality_bbox": {
-                                "type": "array",
-                                "items": {"type": "number"},
-                                "description": "Bounding box coordinates [x1, y1, x2, y2] for nationality field"
-                            },
-                            "nationality_confidence": {
-                                "type": "number",
-                                "description": "Confidence (0-1) for nationality extraction"
-                            },
-                            "address": {
-                                "type": "string",
-                                "description": "Address if available on document - extract complete unmasked value, do not use asterisks or stars"
-                            },
-                            "address_bbox": {
-                                "type": "array",
-                                "items": {"type": "number"},
-                                "description": "Bounding box coordinates [x1, y1, x2, y2] for address field"
-                            },
-                            "address_confidence": {
-                                "type": "number",
-                                "description": "Confidence (0-1) for address extraction"
-                            },
-                            "extracted_text": {
-                                "type": "string",
-                                "description": "All text extracted from the document - extract complete unmasked text, do not use asterisks or stars"
+                                "items": _SCHEMAS.get(
+                                    document_type, _IDENTITY_SCHEMA
+                                )
                             }
                         },
-                        "required": [
-                            "document_type",
-                            "full_name",
-                            "document_number",
-                            "extracted_text"
-                        ]
+                        "required": ["documents"]
                     }
                 }
             },
+            max_tokens=MAX_OUTPUT_TOKENS * len(batch),
+            temperature=0.1
+        )
+
+        parsed = orjson.loads(response.choices[0].message.content)
+        documents = parsed["documents"] if isinstance(parsed, dict) else parsed
+        if len(documents) != len(batch):
+            raise ValueError(
+                f"Batched response returned {len(documents)} results "
+                f"for {len(batch)} images"
+            )
+        return documents
+
+    def extract_many(
+        self,
+        image_sources: List[str],
+        document_type: str = "auto",
+        max_workers: int = 8
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract identity information from many documents concurrently
+
+        The calls are blocking network requests, so overlapping them in a
+        thread pool hides their latency without an asyncio rewrite. The
+        shared httpx client is thread-safe; keep max_workers at or below
+        its max_connections limit.
+
+        Args:
+            image_sources: Paths or URLs of document images
+            document_type: Type applied to every document
+            max_workers: Number of concurrent extraction threads
+
+        Returns:
+            List of result dictionaries, in input order
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(
+                lambda source: self.extract_identity_info(source, document_type),
+                image_sources
+            ))
+
+    def _call_with_retry(self, **kwargs):
+        """Call the completion API, retrying transient failures with backoff"""
+        for attempt in range(RETRY_MAX_ATTEMPTS):
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt == RETRY_MAX_ATTEMPTS - 1 or not _is_retryable(e):
+                    raise
+                time.sleep(_retry_wait(e, attempt))
+
+    def _completion_request(
+        self,
+        prompt: str,
+        image_content: Dict[str, Any],
+        document_type: str = "auto"
+    ) -> Dict[str, Any]:
+        """Build the chat-completion request kwargs for an extraction call"""
+        return dict(
+            model=self.model,
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        image_content
+                    ]
+                }
+            ],
+            response_format=_RESPONSE_FORMATS.get(
+                document_type, _RESPONSE_FORMATS["auto"]
+            ),
+            max_tokens=MAX_OUTPUT_TOKENS,
             temperature=0.1  # Lower temperature for more consistent extraction
         )
 
-        # Parse and return the response
-        result = json.loads(response.choices[0].message.content)
-        return result
+    def _get_prompt(self, document_type: str) -> str:
+        """Select the extraction prompt for a document type"""
+        return _PROMPTS.get(document_type, _AUTO_DETECT_PROMPT)
 
-    def _get_passport_prompt(self) -> str:
-        """Get prompt for passport extraction"""
-        return """Extract all relevant information from this passport document for KYC identity verification.
 
-IMPORTANT: Extract the COMPLETE, UNMASKED values exactly as they appear on the document. Do NOT mask, redact, or replace any characters with asterisks or stars.
 
-For each extracted field, also provide:
-- Bounding box coordinates [x1, y1, x2, y2] in pixels relative to the image size
-- A confidence score between 0 and 1 (1 = highest confidence)
 
-For each extracted field, also provide the bounding box coordinates [x1, y1, x2, y2] where:
-- (x1, y1) is the top-left corner
-- (x2, y2) is the bottom-right corner
-- Coordinates are in pixels relative to the image dimensions
 
-Focus on extracting:
-- Full name (as it appears on the passport) - extract the complete name without masking
-- Date of birth - extract the complete date without masking
-- Passport number - extract the complete number without masking
-- Expiry date
-- Issue date
-- Nationality - extract the complete nationality without masking
-- Any other identifying information
+class AsyncKYCIdentityVerifier(KYCIdentityVerifier):
+    """Async variant that overlaps extraction calls under a concurrency cap
 
-Be precise and extract dates in YYYY-MM-DD format. Include all visible text from the document. Return the actual values as they appear, not masked versions."""
+    Network latency dominates extraction time, so running documents
+    concurrently is the main throughput lever. In-flight requests are
+    bounded by a semaphore and dispatch rate by an optional
+    requests-per-second gate.
+    """
 
-    def _get_driver_license_prompt(self) -> str:
-        """Get prompt for driver's license extraction"""
-        return """Extract all relevant information from this driver's license document for KYC identity verification.
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_concurrency: int = 4,
+        requests_per_second: Optional[float] = None,
+        cache_enabled: bool = False
+    ):
+        """
+        Initialize the async KYC Identity Verifier
 
-IMPORTANT: Extract the COMPLETE, UNMASKED values exactly as they appear on the document. Do NOT mask, redact, or replace any characters with asterisks or stars.
+        Args:
+            api_key: Fireworks API key. If not provided, reads from FIREWORKS_API_KEY env var
+            max_concurrency: Maximum number of in-flight extraction requests
+            requests_per_second: Optional cap on request dispatch rate
+            cache_enabled: Cache extraction results keyed by image content
+        """
+        # The async client has its own pool; warming the sync one here
+        # would prime the wrong connections
+        super().__init__(
+            api_key=api_key, cache_enabled=cache_enabled, warm_connection=False
+        )
 
-For each extracted field, also provide:
-- Bounding box coordinates [x1, y1, x2, y2] in pixels relative to the image size
-- A confidence score between 0 and 1 (1 = highest confidence)
+        self.client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url="https://api.fireworks.ai/inference/v1",
+            http_client=_get_async_http_client()
+        )
 
-For each extracted field, also provide the bounding box coordinates [x1, y1, x2, y2] where:
-- (x1, y1) is the top-left corner
-- (x2, y2) is the bottom-right corner
-- Coordinates are in pixels relative to the image dimensions
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._min_interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._dispatch_lock = asyncio.Lock()
+        self._last_dispatch = 0.0
 
-Focus on extracting:
-- Full name (as it appears on the license) - extract the complete name without masking
-- Date of birth - extract the complete date without masking
-- License number - extract the complete number without masking
-- Expiry date
-- Issue date
-- Address - extract the complete address without masking
-- Any other identifying information
+    async def warm_connection(self):
+        """Prime the async connection pool with a cheap pre-flight request
 
-Be precise and extract dates in YYYY-MM-DD format. Include all visible text from the document. Return the actual values as they appear, not masked versions."""
+        __init__ cannot await, so servers that care about first-request
+        latency should call this once at startup. Failures are ignored.
+        """
+        try:
+            await self.client.models.list(timeout=2.0)
+        except Exception:
+            pass
+
+    async def _throttle(self):
+        """Space out request dispatch to honor the requests-per-second cap"""
+        if not self._min_interval:
+            return
+        async with self._dispatch_lock:
+            now = time.monotonic()
+            wait = self._last_dispatch + self._min_interval - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+                now = time.monotonic()
+            self._last_dispatch = now
+
+    async def extract_identity_info_async(
+        self,
+        image_source: str,
+        document_type: str = "auto"
+    ) -> Dict[str, Any]:
+        """
+        Extract identity information from document image (async)
 
-    def _get_auto_detect_prompt(self) -> str:
-        """Get prompt for auto-detecting document type"""
-        return """Analyze this identity document and extract all relevant information for KYC identity verification.
+        Args:
+            image_source: Path to local image file or URL to image
+            document_type: Type of document - "passport", "driver_license", or "auto"
 
-IMPORTANT: Extract the COMPLETE, UNMASKED values exactly as they appear on the document. Do NOT mask, redact, or replace any characters with asterisks or stars.
+        Returns:
+            Dictionary containing extracted identity information
+        """
+        if self.cache_enabled:
+            cache_key = self._cache_key(image_source, document_type)
+            cached = self._result_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached)
 
-For each extracted field, also provide:
-- Bounding box coordinates [x1, y1, x2, y2] in pixels relative to the image size
-- A confidence score between 0 and 1 (1 = highest confidence)
+        prompt = self._get_prompt(document_type)
+        image_content = self._prepare_image_content(image_source)
 
-For each extracted field, also provide the bounding box coordinates [x1, y1, x2, y2] where:
-- (x1, y1) is the top-left corner
-- (x2, y2) is the bottom-right corner
-- Coordinates are in pixels relative to the image dimensions
+        async with self._semaphore:
+            await self._throttle()
+            response = await self._call_with_retry(
+                **self._completion_request(prompt, image_content, document_type)
+            )
 
-First, identify the document type (passport, driver's license, national ID, etc.), then extract:
-- Full name - extract the complete name without masking
-- Date of birth - extract the complete date without masking
-- Document number - extract the complete number without masking
-- Expiry date
-- Issue date
-- Nationality (if applicable) - extract the complete nationality without masking
-- Address (if applicable) - extract the complete address without masking
-- Any other identifying information
+        result = orjson.loads(response.choices[0].message.content)
+        if self.cache_enabled:
+            # Store a copy so callers mutating the result can't poison it
+            self._result_cache[cache_key] = dict(result)
+        return result
 
-Be precise and extract dates in YYYY-MM-DD format. Include all visible text from the document. Return the actual values as they appear, not masked versions."""
+    async def _call_with_retry(self, **kwargs):
+        """Call the completion API, retrying transient failures with backoff"""
+        for attempt in range(RETRY_MAX_ATTEMPTS):
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt == RETRY_MAX_ATTEMPTS - 1 or not _is_retryable(e):
+                    raise
+                await asyncio.sleep(_retry_wait(e, attempt))
+
+    async def extract_many(
+        self,
+        image_sources: List[str],
+        document_type: str = "auto"
+    ) -> List[Any]:
+        """
+        Extract identity information from many documents concurrently
+
+        Args:
+            image_sources: Paths or URLs of document images
+            document_type: Type applied to every document
+
+        Returns:
+            List of result dictionaries (or exceptions), in input order
+        """
+        return await asyncio.gather(
+            *(
+                self.extract_identity_info_async(source, document_type)
+                for source in image_sources
+            ),
+            return_exceptions=True
+        )
+
+    async def extract_stream(
+        self,
+        image_sources: Union[Iterable[str], "AsyncIterator[str]"],
+        document_type: str = "auto",
+        workers: int = 8
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream extraction results from a fixed-size worker pool
+
+        Unlike extract_many, sources are pulled lazily and results are
+        yielded as they complete, so a 10k-document batch never sits in
+        memory at once. Bounded queues give backpressure in both
+        directions: a slow consumer pauses the workers, and the feeder
+        stays only a few items ahead of them.
+
+        Args:
+            image_sources: Iterable or async iterable of paths/URLs
+            document_type: Type applied to every document
+            workers: Number of concurrent worker coroutines
+
+        Yields:
+            Result dictionaries in completion order, each tagged with
+            "image_source"; failures yield {"image_source", "error"}
+        """
+        in_queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        out_queue: asyncio.Queue = asyncio.Queue(maxsize=workers * 2)
+        done = object()  # per-call sentinel, can't collide with a source
+
+        async def feed():
+            if hasattr(image_sources, "__aiter__"):
+                async for source in image_sources:
+                    await in_queue.put(source)
+            else:
+                for source in image_sources:
+                    await in_queue.put(source)
+            for _ in range(workers):
+                await in_queue.put(done)
+
+        async def work():
+            while True:
+                source = await in_queue.get()
+                if source is done:
+                    await out_queue.put(done)
+                    return
+                try:
+                    result = await self.extract_identity_info_async(
+                        source, document_type
+                    )
+                    result["image_source"] = source
+                except Exception as e:
+                    result = {"image_source": source, "error": str(e)}
+                await out_queue.put(result)
+
+        tasks = [asyncio.create_task(feed())]
+        tasks.extend(asyncio.create_task(work()) for _ in range(workers))
+        try:
+            remaining = workers
+            while remaining:
+                item = await out_queue.get()
+                if item is done:
+                    remaining -= 1
+                    continue
+                yield item
+        finally:
+            # Consumer bailed early (or a queue op failed): stop the pool
+            for task in tasks:
+                task.cancel()
 
 
 def main():
     """Example usage of the KYC Identity Verifier"""
 
-    # Try to get API key from environment or use default
-    api_key = os.environ.get("FIREWORKS_API_KEY")
-    if not api_key:
-        # Default API key (can be overridden by environment variable)
-        api_key = "fw_3ZRAE3N6e8Gx3PrvM8QnrGkA"
-
-    # Initialize the verifier
+    # Initialize the verifier; key resolution (FIREWORKS_API_KEY) is
+    # centralized in get_api_key and cached for the process lifetime
     try:
-        verifier = KYCIdentityVerifier(api_key=api_key)
+        verifier = KYCIdentityVerifier()
         print("✓ KYC Identity Verifier initialized\n")
     except ValueError as e:
         print(f"✗ Error: {e}")
@@ -347,7 +971,7 @@ def main():
         )
 
         print("\nExtracted Information:")
-        print(json.dumps(result, indent=2))
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
 
     except Exception as e:
         print(f"✗ Error processing image: {e}")
@@ -369,7 +993,7 @@ def main():
     #         )
     #
     #         print("\nExtracted Information:")
-    #         print(json.dumps(result, indent=2))
+    #         print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
     #
     #     except Exception as e:
     #         print(f"✗ Error processing image: {e}")
@@ -8,8 +8,17 @@ import os
 import json
 from test_ocr_kyc import KYCIdentityVerifier
 
-# API key
-API_KEY = "fw_3ZRAE3N6e8Gx3PrvM8QnrGkA"
+# Shared verifier so repeated test calls reuse one OpenAI client (and its
+# httpx pool / TLS session) instead of rebuilding it per call. Key
+# resolution (FIREWORKS_API_KEY) happens once inside the verifier
+_verifier = None
+
+def _get_verifier() -> KYCIdentityVerifier:
+    """Get or create the shared verifier"""
+    global _verifier
+    if _verifier is None:
+        _verifier = KYCIdentityVerifier()
+    return _verifier
 
 def test_with_url(image_url: str, doc_type: str = "auto"):
     """Test OCR extraction with image URL"""
@@ -18,7 +27,7 @@ def test_with_url(image_url: str, doc_type: str = "auto"):
     print(f"Document Type: {doc_type}")
     print(f"{'='*60}\n")
 
-    verifier = KYCIdentityVerifier(api_key=API_KEY)
+    verifier = _get_verifier()
 
     try:
         result = verifier.extract_identity_info(
@@ -45,7 +54,7 @@ def test_with_local_file(image_path: str, doc_type: str = "auto"):
     print(f"Document Type: {doc_type}")
     print(f"{'='*60}\n")
 
-    verifier = KYCIdentityVerifier(api_key=API_KEY)
+    verifier = _get_verifier()
 
     try:
         result = verifier.extract_identity_info(